@@ -1,25 +1,41 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime, date
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import os
 from pathlib import Path
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-from io import BytesIO
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # =============================================
 # CONFIGURAÇÕES PRINCIPAIS
 # =============================================
 NOME_PLANILHA = "Controle de custos -Ártico"
 ARQUIVO_CREDENCIAIS = "credenciais.json"
+CAMINHOS_CREDENCIAIS = [
+    Path(__file__).parent / ARQUIVO_CREDENCIAIS,  # Mesmo diretório do script
+    Path(ARQUIVO_CREDENCIAIS),  # Diretório atual
+    Path.cwd() / ARQUIVO_CREDENCIAIS,  # Diretório de trabalho atual
+]
+PASTA_CACHE = Path(".cache")
+ARQUIVO_CACHE = PASTA_CACHE / "sheet.parquet"
+ARQUIVO_REVISAO = PASTA_CACHE / "sheet_revision.json"
 COLUNAS = [
     "Data", "Cliente/Projeto", "Categoria", "Descrição",
     "Quantidade", "Preço Unitário", "Subtotal", "Desconto (%)",
     "Total", "Status Pagamento", "Forma Pagamento", "Observações"
 ]
+# Colunas exibidas na tabela do painel e exportadas para Excel
+COLUNAS_EXIBIR = [
+    "Data", "Cliente/Projeto", "Categoria", "Descrição",
+    "Quantidade", "Preço Unitário", "Total", "Status Pagamento"
+]
+COLUNAS_CATEGORICAS = ["Categoria", "Status Pagamento", "Cliente/Projeto", "Forma Pagamento"]
+
+# Fragmentos (reexecução parcial) disponíveis conforme a versão do Streamlit
+_fragmento = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', lambda f: f)
 
 # Configuração da página
 st.set_page_config(
@@ -85,33 +101,22 @@ def configurar_planilha(aba):
                 else:
                     dados_existentes = todos_valores[1:] if len(todos_valores) > 1 else []
 
+            # Montar matriz com os dados existentes (ignorando linhas vazias)
+            # e garantir que cada linha tem todas as colunas
+            matriz = [
+                (linha + [''] * (len(COLUNAS) - len(linha)))[:len(COLUNAS)]
+                for linha in dados_existentes
+                if any(linha)
+            ]
+
             # Limpar planilha
             aba.clear()
 
-            # Adicionar cabeçalho
-            aba.append_row(COLUNAS)
-
-            # Restaurar dados existentes (se houver)
-            if dados_existentes:
-                for linha in dados_existentes:
-                    if any(linha):  # Se linha não está vazia
-                        # Garantir que linha tem todas as colunas
-                        linha_completa = linha + [''] * (len(COLUNAS) - len(linha))
-                        aba.append_row(linha_completa[:len(COLUNAS)])
+            # Gravar cabeçalho e dados restaurados em uma única chamada à API
+            aba.update(range_name='A1', values=[COLUNAS] + matriz, value_input_option='RAW')
 
             # Formatação do cabeçalho
             try:
-                # Formatar primeira linha (cabeçalho)
-                aba.format('1:1', {
-                    'backgroundColor': {'red': 0.2, 'green': 0.4, 'blue': 0.8},
-                    'textFormat': {
-                        'foregroundColor': {'red': 1, 'green': 1, 'blue': 1},
-                        'fontSize': 11,
-                        'bold': True
-                    },
-                    'horizontalAlignment': 'CENTER'
-                })
-
                 # Formatar largura das colunas
                 dimensoes = [
                     ('A:A', 120),  # Data
@@ -128,8 +133,37 @@ def configurar_planilha(aba):
                     ('L:L', 200),  # Observações
                 ]
 
-                for coluna, largura in dimensoes:
-                    aba.update_dimension_property(coluna, 'COLUMN_WIDTH', largura)
+                requisicoes = [
+                    {'updateDimensionProperties': {
+                        'range': {
+                            'sheetId': aba.id,
+                            'dimension': 'COLUMNS',
+                            'startIndex': i,
+                            'endIndex': i + 1
+                        },
+                        'properties': {'pixelSize': largura},
+                        'fields': 'pixelSize'
+                    }}
+                    for i, (_, largura) in enumerate(dimensoes)
+                ]
+
+                # Formatar primeira linha (cabeçalho)
+                requisicoes.append({'repeatCell': {
+                    'range': {'sheetId': aba.id, 'startRowIndex': 0, 'endRowIndex': 1},
+                    'cell': {'userEnteredFormat': {
+                        'backgroundColor': {'red': 0.2, 'green': 0.4, 'blue': 0.8},
+                        'textFormat': {
+                            'foregroundColor': {'red': 1, 'green': 1, 'blue': 1},
+                            'fontSize': 11,
+                            'bold': True
+                        },
+                        'horizontalAlignment': 'CENTER'
+                    }},
+                    'fields': 'userEnteredFormat(backgroundColor,textFormat,horizontalAlignment)'
+                }})
+
+                # Enviar larguras e formatação em um único spreadsheets.batchUpdate
+                aba.spreadsheet.batch_update({'requests': requisicoes})
 
             except Exception as format_error:
                 st.warning(f"Formatação aplicada parcialmente: {format_error}")
@@ -142,8 +176,39 @@ def configurar_planilha(aba):
         return False, f"❌ Erro ao configurar planilha: {str(e)}"
 
 
+def criar_sessao_http(creds):
+    """Cria uma sessão autenticada com pool de conexões e retry para erros transitórios"""
+    from google.auth.transport.requests import AuthorizedSession
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    sessao = AuthorizedSession(creds)
+    adaptador = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(total=5, backoff_factor=0.5,
+                          status_forcelist=[429, 500, 502, 503, 504])
+    )
+    sessao.mount('https://', adaptador)
+    return sessao
+
+
+@st.cache_resource
+def _ler_credenciais():
+    """Localiza e lê o arquivo de credenciais uma única vez por processo"""
+    for caminho in CAMINHOS_CREDENCIAIS:
+        if caminho.exists():
+            return caminho, caminho.read_bytes()
+    # Exceções não são cacheadas: o arquivo é procurado de novo na próxima execução
+    raise FileNotFoundError(ARQUIVO_CREDENCIAIS)
+
+
 @st.cache_resource
 def init_google_sheets():
+    # Importados aqui para não atrasar a primeira renderização da página
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     try:
         scope = [
             "https://www.googleapis.com/auth/spreadsheets",
@@ -154,32 +219,25 @@ def init_google_sheets():
         try:
             if hasattr(st, 'secrets') and 'credentials' in st.secrets:
                 credentials_dict = dict(st.secrets["credentials"])
-                creds = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, scope)
+                creds = Credentials.from_service_account_info(credentials_dict, scopes=scope)
                 st.success("✅ Conectado usando Streamlit Secrets")
             else:
                 raise Exception("Secrets não encontrados")
         except:
             # Se não funcionar, usar arquivo local
-            cred_paths = [
-                Path(__file__).parent / ARQUIVO_CREDENCIAIS,  # Mesmo diretório do script
-                Path(ARQUIVO_CREDENCIAIS),  # Diretório atual
-                Path.cwd() / ARQUIVO_CREDENCIAIS,  # Diretório de trabalho atual
-            ]
-
-            cred_file = None
-            for path in cred_paths:
-                if path.exists():
-                    cred_file = path
-                    break
+            try:
+                cred_file, cred_bytes = _ler_credenciais()
+            except FileNotFoundError:
+                cred_file = None
 
             if not cred_file:
                 st.error(f"""
                 ❌ **Arquivo de credenciais não encontrado!**
 
                 Procurado em:
-                - {cred_paths[0]}
-                - {cred_paths[1]}
-                - {cred_paths[2]}
+                - {CAMINHOS_CREDENCIAIS[0]}
+                - {CAMINHOS_CREDENCIAIS[1]}
+                - {CAMINHOS_CREDENCIAIS[2]}
 
                 **Soluções:**
                 1. Coloque o arquivo `credenciais.json` no mesmo diretório do script
@@ -204,10 +262,11 @@ def init_google_sheets():
                 """)
                 st.stop()
 
-            creds = ServiceAccountCredentials.from_json_keyfile_name(str(cred_file), scope)
+            creds = Credentials.from_service_account_info(json.loads(cred_bytes), scopes=scope)
             st.success(f"✅ Conectado usando arquivo: {cred_file.name}")
 
-        client = gspread.authorize(creds)
+        # Cliente com sessão HTTP persistente (conexões reaproveitadas e retry)
+        client = gspread.Client(auth=creds, session=criar_sessao_http(creds))
 
         # Tentar abrir a planilha
         try:
@@ -263,39 +322,266 @@ except:
 # =============================================
 # FUNÇÕES AUXILIARES
 # =============================================
-@st.cache_data(ttl=300)  # Cache por 5 minutos
-def carregar_dados():
+def _revisao_planilha():
+    """Retorna a data da última modificação da planilha no Google Drive"""
     try:
-        registros = aba.get_all_records()
-        if registros:
-            df = pd.DataFrame(registros)
-            # Converter colunas numéricas
-            colunas_numericas = ['Quantidade', 'Preço Unitário', 'Subtotal', 'Desconto (%)', 'Total']
-            for col in colunas_numericas:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-            # Converter datas
-            if 'Data' in df.columns:
-                df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
-
-            return df
-        return pd.DataFrame(columns=COLUNAS)
-    except Exception as e:
-        st.error(f"Erro ao carregar dados: {str(e)}")
-        return pd.DataFrame(columns=COLUNAS)
+        return aba.spreadsheet.get_lastUpdateTime()
+    except Exception:
+        return None
 
 
-def salvar_registro(registro):
+def _ler_cache_disco(revisao):
+    """Lê o snapshot salvo em disco se ele corresponder à revisão atual"""
+    if revisao is None or not ARQUIVO_CACHE.exists() or not ARQUIVO_REVISAO.exists():
+        return None
+    try:
+        if json.loads(ARQUIVO_REVISAO.read_text()).get('revisao') != revisao:
+            return None
+        return _categorizar(pd.read_parquet(ARQUIVO_CACHE))
+    except Exception:
+        return None
+
+
+def _gravar_cache_disco(df, revisao):
+    """Salva o snapshot da planilha em disco junto com a revisão correspondente"""
+    if revisao is None:
+        return
+    try:
+        PASTA_CACHE.mkdir(exist_ok=True)
+        df.to_parquet(ARQUIVO_CACHE, compression='zstd')
+        ARQUIVO_REVISAO.write_text(json.dumps({'revisao': revisao}))
+    except Exception:
+        # Cache em disco é apenas otimização; falhas não impedem o uso do app
+        pass
+
+
+def _buscar_planilha():
+    """Busca todos os registros da planilha e converte os tipos das colunas"""
+    valores = aba.get_all_values()
+    if len(valores) < 2:
+        return _converter_tipos(pd.DataFrame(columns=COLUNAS))
+
+    return _converter_tipos(pd.DataFrame(valores[1:], columns=valores[0]))
+
+
+def _converter_tipos(df):
+    """Converte as colunas numéricas e de data vindas da planilha como texto"""
+    # Converter colunas numéricas
+    colunas_numericas = [col for col in
+                         ['Quantidade', 'Preço Unitário', 'Subtotal', 'Desconto (%)', 'Total']
+                         if col in df.columns]
+    df[colunas_numericas] = df[colunas_numericas].apply(pd.to_numeric, errors='coerce').fillna(0).astype('float64')
+
+    # Converter datas (cada data distinta é convertida uma única vez)
+    if 'Data' in df.columns:
+        unicas = df['Data'].unique()
+        convertidas = pd.to_datetime(pd.Series(unicas), format='%d/%m/%Y', errors='coerce')
+        df['Data'] = df['Data'].map(dict(zip(unicas, convertidas))).astype('datetime64[ns]')
+
+    return _categorizar(df)
+
+
+def _categorizar(df):
+    """Armazena as colunas de texto repetitivo como category (código + dicionário)"""
+    for col in COLUNAS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+@st.cache_data(ttl=300, show_spinner=False)  # Cache por 5 minutos
+def carregar_dados():
+    """Lê os registros da planilha (executado em segundo plano)"""
+    # Não cria elementos na página: erros sobem para a thread principal exibir
+    # Reaproveitar snapshot em disco enquanto a planilha não for alterada
+    revisao = _revisao_planilha()
+    df = _ler_cache_disco(revisao)
+    if df is None:
+        df = _buscar_planilha()
+        _gravar_cache_disco(df, revisao)
+    return df
+
+
+def _executor():
+    """Pool exclusivo da sessão, para que a carga de um usuário não espere a de outro"""
+    if '_executor' not in st.session_state:
+        st.session_state['_executor'] = ThreadPoolExecutor(max_workers=1)
+    return st.session_state['_executor']
+
+
+def em_segundo_plano(funcao, *args):
+    """Executa a função no pool de threads com o contexto da sessão atual"""
+    ctx = get_script_run_ctx()
+
+    def tarefa():
+        # Contexto usado apenas pelo st.cache_data; a tarefa não cria elementos
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return funcao(*args)
+
+    return _executor().submit(tarefa)
+
+
+def _aguardar_carga():
+    """Espera a leitura em segundo plano em andamento e a descarta"""
+    # Chamado antes de limpar o cache: uma leitura iniciada antes de um envio
+    # gravaria no cache, depois da limpeza, dados sem os registros novos
+    futuro = st.session_state.pop('_futuro_df', None)
+    if futuro is not None:
+        futuro.exception()  # Aguarda sem propagar erros da leitura
+
+
+def recarregar_dados():
+    """Descarta os dados da sessão para forçar nova leitura da planilha"""
+    # Com registros ainda na fila, a planilha não os tem: manter os dados da sessão
+    if not enviar_pendentes():
+        return False
+    _aguardar_carga()
+    carregar_dados.clear()
+    st.session_state.pop('df', None)
+    return True
+
+
+def enviar_pendentes():
+    """Envia todos os registros pendentes da sessão em uma única chamada à API"""
+    pendentes = st.session_state.setdefault('_pending', [])
+    if not pendentes:
+        return True
     try:
-        aba.append_row(list(registro.values()))
-        st.cache_data.clear()  # Limpar cache para atualizar dados
+        aba.append_rows(pendentes, value_input_option='RAW', insert_data_option='INSERT_ROWS')
+        pendentes.clear()
+        _aguardar_carga()
+        # Novas sessões passam a ler a planilha atualizada; a sessão atual já
+        # tem os registros em st.session_state['df']
+        carregar_dados.clear()
         return True
     except Exception as e:
-        st.error(f"Erro ao salvar: {str(e)}")
+        st.error(f"""
+        ❌ **Erro ao salvar:** {str(e)}
+
+        {len(pendentes)} registro(s) continuam na fila e serão reenviados no próximo
+        salvamento ou pelo botão "Enviar Pendentes". Não é preciso digitá-los novamente.
+        """)
         return False
 
 
+def salvar_registro(registro):
+    """Coloca o registro na fila da sessão e envia a fila inteira para a planilha"""
+    pendentes = st.session_state.setdefault('_pending', [])
+    pendentes.append(list(registro.values()))
+
+    # Incluir o registro nos dados da sessão sem reler a planilha
+    if 'df' in st.session_state:
+        novo = _converter_tipos(pd.DataFrame([registro]))
+        if st.session_state['df'].empty:
+            # Evita que o concat com o frame vazio transforme as colunas em object
+            st.session_state['df'] = novo
+        else:
+            # concat com categorias diferentes volta para object; recategorizar
+            st.session_state['df'] = _categorizar(
+                pd.concat([st.session_state['df'], novo], ignore_index=True))
+
+    # A fila só guarda registros cujo envio falhou; eles seguem junto com este
+    return enviar_pendentes()
+
+
+def _opcoes(df):
+    """Lista os valores disponíveis para os filtros de cliente, categoria e status"""
+    # As colunas são category: os valores distintos já estão no próprio dtype
+    return (df['Cliente/Projeto'].cat.categories.tolist(),
+            df['Categoria'].cat.categories.tolist(),
+            df['Status Pagamento'].cat.categories.tolist())
+
+
+# Agregações sem st.cache_data: hashear o df_filtrado inteiro custa mais que o groupby
+def _agg_categoria(df_f):
+    return df_f.groupby('Categoria', sort=False, observed=True)['Total'].sum().reset_index()
+
+
+def _agg_status(df_f):
+    return df_f.groupby('Status Pagamento', sort=False, observed=True)['Total'].sum().reset_index()
+
+
+def _agg_mensal(df_f):
+    return df_f.groupby(df_f['Data'].dt.to_period('M'))['Total'].sum().reset_index()
+
+
+@st.cache_data(max_entries=16)
+def _fig_categoria(agg):
+    import plotly.express as px
+
+    return px.pie(agg, values='Total', names='Categoria',
+                  title="💼 Gastos por Categoria",
+                  color_discrete_sequence=px.colors.qualitative.Set3).to_dict()
+
+
+@st.cache_data(max_entries=16)
+def _fig_status(agg):
+    import plotly.express as px
+
+    return px.bar(agg, x='Status Pagamento', y='Total',
+                  title="💳 Status dos Pagamentos",
+                  color='Status Pagamento',
+                  color_discrete_sequence=px.colors.qualitative.Pastel).to_dict()
+
+
+@st.cache_data(max_entries=16)
+def _fig_temporal(agg):
+    import plotly.express as px
+
+    fig = px.line(agg, x='Data', y='Total',
+                  title="📊 Evolução Mensal dos Gastos",
+                  markers=True)
+    fig.update_traces(line_color='#1e3c72', line_width=3)
+    return fig.to_dict()
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _registros_relatorio(df):
+    """Monta a seção de registros detalhados do relatório em texto"""
+    if df.empty:
+        return ""
+    # Montar todas as linhas de uma vez, coluna a coluna
+    datas = df['Data'].dt.strftime('%d/%m/%Y').fillna('N/A')
+    linhas = ('\nData: ' + datas +
+              '\nCliente: ' + df['Cliente/Projeto'].astype(str) +
+              '\nCategoria: ' + df['Categoria'].astype(str) +
+              '\nDescrição: ' + df['Descrição'].astype(str) +
+              '\nTotal: R$ ' + df['Total'].map('{:,.2f}'.format) +
+              '\nStatus: ' + df['Status Pagamento'].astype(str) +
+              '\n---\n')
+    return ''.join(linhas.tolist())
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _to_csv_bytes(df):
+    return df.to_csv(index=False).encode('utf-8-sig')
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _to_xlsx_bytes(df):
+    """Gera o Excel das colunas exibidas, gravando linha a linha em modo de memória constante"""
+    from io import BytesIO
+    import xlsxwriter
+
+    # Com constant_memory cada linha é descartada ao iniciar a seguinte, por isso
+    # a gravação é feita linha a linha (to_excel grava coluna a coluna)
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'default_date_format': 'dd/mm/yyyy'
+    })
+    worksheet = workbook.add_worksheet('Custos')
+    worksheet.write_row(0, 0, COLUNAS_EXIBIR, workbook.add_format({'bold': True}))
+
+    dados = df[COLUNAS_EXIBIR].astype(object)
+    dados = dados.where(dados.notna(), None)  # NaT/NaN viram células vazias
+    for i, linha in enumerate(dados.itertuples(index=False, name=None), start=1):
+        worksheet.write_row(i, 0, linha)
+
+    workbook.close()
+    return output.getvalue()
+
+
 def gerar_relatorio_simples(df):
     """Gera um relatório simples em texto"""
     relatorio = f"""
@@ -312,21 +598,12 @@ DISTRIBUIÇÃO POR CATEGORIA:
 """
 
     if not df.empty:
-        distribuicao = df.groupby('Categoria')['Total'].sum()
+        distribuicao = df.groupby('Categoria', observed=True)['Total'].sum()
         for categoria, valor in distribuicao.items():
             relatorio += f"- {categoria}: R$ {valor:,.2f}\n"
 
     relatorio += "\n\nREGISTROS DETALHADOS:\n"
-    for _, row in df.iterrows():
-        relatorio += f"""
-Data: {row['Data'].strftime('%d/%m/%Y') if pd.notnull(row['Data']) else 'N/A'}
-Cliente: {row['Cliente/Projeto']}
-Categoria: {row['Categoria']}
-Descrição: {row['Descrição']}
-Total: R$ {row['Total']:,.2f}
-Status: {row['Status Pagamento']}
----
-"""
+    relatorio += _registros_relatorio(df)
 
     return relatorio
 
@@ -335,6 +612,10 @@ Status: {row['Status Pagamento']}
 # INTERFACE PRINCIPAL
 # =============================================
 
+# Iniciar a leitura da planilha enquanto o cabeçalho e a barra lateral são exibidos
+if 'df' not in st.session_state:
+    st.session_state['_futuro_df'] = em_segundo_plano(carregar_dados)
+
 # Header personalizado
 st.markdown("""
 <div class="main-header">
@@ -354,11 +635,25 @@ with st.sidebar:
             sucesso, mensagem = configurar_planilha(aba)
             if sucesso:
                 st.success(mensagem)
+                _aguardar_carga()
                 st.cache_data.clear()  # Limpar cache
-                st.rerun()
+                if recarregar_dados():
+                    st.rerun()
             else:
                 st.error(mensagem)
 
+    if st.button("🔄 Recarregar do Google Sheets", help="Lê novamente todos os registros da planilha"):
+        if recarregar_dados():
+            st.rerun()
+
+    # Registros cujo envio falhou, aguardando nova tentativa
+    pendentes = st.session_state.get('_pending', [])
+    if pendentes:
+        st.info(f"⏳ {len(pendentes)} registro(s) aguardando envio")
+        if st.button("📤 Enviar Pendentes", help="Envia agora os registros da fila para a planilha"):
+            if enviar_pendentes():
+                st.rerun()
+
     st.markdown("---")
 
     st.markdown("### 📝 **NOVO REGISTRO DE CUSTO**")
@@ -444,164 +739,170 @@ with st.sidebar:
 # ÁREA PRINCIPAL - DASHBOARD
 # =============================================
 
-# Carregar dados
-df = carregar_dados()
+# Carregar dados (mantidos na sessão e atualizados localmente a cada registro)
+if 'df' not in st.session_state:
+    with st.spinner("Carregando dados da planilha..."):
+        # Sem leitura em andamento (descartada por um envio/limpeza), iniciar outra
+        futuro_df = st.session_state.pop('_futuro_df', None) or em_segundo_plano(carregar_dados)
+        try:
+            st.session_state['df'] = futuro_df.result()
+        except Exception as e:
+            st.error(f"Erro ao carregar dados: {str(e)}")
+df = st.session_state.get('df', _converter_tipos(pd.DataFrame(columns=COLUNAS)))
 
-if not df.empty and len(df) > 0:
-    # Filtros no topo
-    st.markdown("### 🔍 **FILTROS E PESQUISA**")
-    col1, col2, col3, col4 = st.columns(4)
 
-    with col1:
-        clientes_unicos = ["Todos"] + list(df['Cliente/Projeto'].unique())
-        filtro_cliente = st.selectbox("Cliente/Projeto", clientes_unicos)
+# Filtros e painel executados como fragmento: interações nesta área
+# reexecutam apenas o painel, sem refazer barra lateral e formulário
+@_fragmento
+def painel(df):
+    if not df.empty and len(df) > 0:
+        # Filtros no topo
+        st.markdown("### 🔍 **FILTROS E PESQUISA**")
+        col1, col2, col3, col4 = st.columns(4)
 
-    with col2:
-        categorias_unicas = ["Todas"] + list(df['Categoria'].unique())
-        filtro_categoria = st.selectbox("Categoria", categorias_unicas)
+        clientes, categorias, status = _opcoes(df)
 
-    with col3:
-        status_unicos = ["Todos"] + list(df['Status Pagamento'].unique())
-        filtro_status = st.selectbox("Status Pagamento", status_unicos)
+        with col1:
+            clientes_unicos = ["Todos"] + clientes
+            filtro_cliente = st.selectbox("Cliente/Projeto", clientes_unicos)
 
-    with col4:
-        if 'Data' in df.columns and not df['Data'].isna().all():
-            data_min = df['Data'].min().date() if pd.notnull(df['Data'].min()) else date.today()
-        else:
-            data_min = date.today()
-        periodo = st.date_input("Período (início)", value=data_min)
-
-    # Aplicar filtros
-    df_filtrado = df.copy()
-    if filtro_cliente != "Todos":
-        df_filtrado = df_filtrado[df_filtrado['Cliente/Projeto'] == filtro_cliente]
-    if filtro_categoria != "Todas":
-        df_filtrado = df_filtrado[df_filtrado['Categoria'] == filtro_categoria]
-    if filtro_status != "Todos":
-        df_filtrado = df_filtrado[df_filtrado['Status Pagamento'] == filtro_status]
-    if 'Data' in df_filtrado.columns:
-        df_filtrado = df_filtrado[df_filtrado['Data'].dt.date >= periodo]
-
-    # Métricas principais
-    st.markdown("### 📊 **RESUMO EXECUTIVO**")
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        total_registros = len(df_filtrado)
-        st.metric("📋 Total de Registros", total_registros)
-
-    with col2:
-        total_gasto = df_filtrado['Total'].sum()
-        st.metric("💰 Valor Total", f"R$ {total_gasto:,.2f}")
-
-    with col3:
-        ticket_medio = df_filtrado['Total'].mean() if len(df_filtrado) > 0 else 0
-        st.metric("📈 Ticket Médio", f"R$ {ticket_medio:,.2f}")
-
-    with col4:
-        pendentes = len(df_filtrado[df_filtrado['Status Pagamento'] == 'Pendente'])
-        st.metric("⏳ Pagamentos Pendentes", pendentes)
-
-    # Gráficos
-    if len(df_filtrado) > 0:
-        st.markdown("### 📈 **ANÁLISES VISUAIS**")
+        with col2:
+            categorias_unicas = ["Todas"] + categorias
+            filtro_categoria = st.selectbox("Categoria", categorias_unicas)
 
-        col1, col2 = st.columns(2)
+        with col3:
+            status_unicos = ["Todos"] + status
+            filtro_status = st.selectbox("Status Pagamento", status_unicos)
+
+        with col4:
+            if 'Data' in df.columns and not df['Data'].isna().all():
+                data_min = df['Data'].min().date() if pd.notnull(df['Data'].min()) else date.today()
+            else:
+                data_min = date.today()
+            periodo = st.date_input("Período (início)", value=data_min)
+
+        # Aplicar filtros (uma única máscara, aplicada de uma vez)
+        mask = np.ones(len(df), dtype=bool)
+        if filtro_cliente != "Todos":
+            mask &= df['Cliente/Projeto'].to_numpy() == filtro_cliente
+        if filtro_categoria != "Todas":
+            mask &= df['Categoria'].to_numpy() == filtro_categoria
+        if filtro_status != "Todos":
+            mask &= df['Status Pagamento'].to_numpy() == filtro_status
+        if 'Data' in df.columns:
+            # Comparação direta sobre o array datetime64 (int64 internamente); NaT resulta em False
+            mask &= df['Data'].to_numpy() >= np.datetime64(periodo, 'ns')
+        df_filtrado = df.loc[mask]
+
+        # Métricas principais
+        st.markdown("### 📊 **RESUMO EXECUTIVO**")
+        col1, col2, col3, col4 = st.columns(4)
 
         with col1:
-            # Gráfico por categoria
-            gastos_categoria = df_filtrado.groupby('Categoria')['Total'].sum().reset_index()
-            if len(gastos_categoria) > 0:
-                fig_categoria = px.pie(gastos_categoria, values='Total', names='Categoria',
-                                       title="💼 Gastos por Categoria",
-                                       color_discrete_sequence=px.colors.qualitative.Set3)
-                st.plotly_chart(fig_categoria, use_container_width=True)
+            total_registros = len(df_filtrado)
+            st.metric("📋 Total de Registros", total_registros)
 
         with col2:
-            # Gráfico por status
-            gastos_status = df_filtrado.groupby('Status Pagamento')['Total'].sum().reset_index()
-            if len(gastos_status) > 0:
-                fig_status = px.bar(gastos_status, x='Status Pagamento', y='Total',
-                                    title="💳 Status dos Pagamentos",
-                                    color='Status Pagamento',
-                                    color_discrete_sequence=px.colors.qualitative.Pastel)
-                st.plotly_chart(fig_status, use_container_width=True)
-
-        # Evolução temporal
-        if 'Data' in df_filtrado.columns and not df_filtrado['Data'].isna().all():
-            st.markdown("### 📅 **EVOLUÇÃO TEMPORAL**")
-            df_temporal = df_filtrado.groupby(df_filtrado['Data'].dt.to_period('M'))['Total'].sum().reset_index()
-            df_temporal['Data'] = df_temporal['Data'].astype(str)
-
-            if len(df_temporal) > 0:
-                fig_temporal = px.line(df_temporal, x='Data', y='Total',
-                                       title="📊 Evolução Mensal dos Gastos",
-                                       markers=True)
-                fig_temporal.update_traces(line_color='#1e3c72', line_width=3)
-                st.plotly_chart(fig_temporal, use_container_width=True)
-
-    # Tabela detalhada
-    st.markdown("### 📋 **REGISTROS DETALHADOS**")
-
-    # Configurar colunas para exibição
-    colunas_exibir = ['Data', 'Cliente/Projeto', 'Categoria', 'Descrição',
-                      'Quantidade', 'Preço Unitário', 'Total', 'Status Pagamento']
-
-    df_display = df_filtrado[colunas_exibir].copy()
-    if 'Data' in df_display.columns:
-        df_display['Data'] = df_display['Data'].dt.strftime('%d/%m/%Y')
-
-    st.dataframe(df_display, use_container_width=True, hide_index=True)
-
-    # Botões de exportação
-    st.markdown("### 📥 **EXPORTAR DADOS**")
-    col1, col2, col3 = st.columns(3)
-
-    with col1:
-        csv = df_filtrado.to_csv(index=False, encoding='utf-8-sig')
-        st.download_button(
-            "📄 Exportar CSV",
-            csv,
-            f"custos_artico_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-            "text/csv",
-            use_container_width=True
+            total_gasto = df_filtrado['Total'].sum()
+            st.metric("💰 Valor Total", f"R$ {total_gasto:,.2f}")
+
+        with col3:
+            ticket_medio = df_filtrado['Total'].mean() if len(df_filtrado) > 0 else 0
+            st.metric("📈 Ticket Médio", f"R$ {ticket_medio:,.2f}")
+
+        with col4:
+            pendentes = len(df_filtrado[df_filtrado['Status Pagamento'] == 'Pendente'])
+            st.metric("⏳ Pagamentos Pendentes", pendentes)
+
+        # Gráficos
+        if len(df_filtrado) > 0:
+            st.markdown("### 📈 **ANÁLISES VISUAIS**")
+
+            col1, col2 = st.columns(2)
+
+            with col1:
+                # Gráfico por categoria
+                gastos_categoria = _agg_categoria(df_filtrado)
+                if len(gastos_categoria) > 0:
+                    st.plotly_chart(_fig_categoria(gastos_categoria), use_container_width=True)
+
+            with col2:
+                # Gráfico por status
+                gastos_status = _agg_status(df_filtrado)
+                if len(gastos_status) > 0:
+                    st.plotly_chart(_fig_status(gastos_status), use_container_width=True)
+
+            # Evolução temporal
+            if 'Data' in df_filtrado.columns and not df_filtrado['Data'].isna().all():
+                st.markdown("### 📅 **EVOLUÇÃO TEMPORAL**")
+                df_temporal = _agg_mensal(df_filtrado)
+                df_temporal['Data'] = df_temporal['Data'].astype(str)
+
+                if len(df_temporal) > 0:
+                    st.plotly_chart(_fig_temporal(df_temporal), use_container_width=True)
+
+        # Tabela detalhada
+        st.markdown("### 📋 **REGISTROS DETALHADOS**")
+
+        # Formatação feita pelo próprio componente, sem copiar o DataFrame
+        st.dataframe(
+            df_filtrado[COLUNAS_EXIBIR],
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                'Data': st.column_config.DateColumn(format='DD/MM/YYYY'),
+                'Quantidade': st.column_config.NumberColumn(format='%.2f'),
+                'Preço Unitário': st.column_config.NumberColumn(format='R$ %.2f'),
+                'Total': st.column_config.NumberColumn(format='R$ %.2f'),
+            }
         )
 
-    with col2:
-        # Exportar Excel
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df_filtrado.to_excel(writer, sheet_name='Custos', index=False)
-        excel_data = output.getvalue()
-
-        st.download_button(
-            "📊 Exportar Excel",
-            excel_data,
-            f"custos_artico_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True
-        )
+        # Botões de exportação
+        st.markdown("### 📥 **EXPORTAR DADOS**")
+        col1, col2, col3 = st.columns(3)
 
-    with col3:
-        # Botão de relatório em texto
-        relatorio_txt = gerar_relatorio_simples(df_filtrado)
-        st.download_button(
-            "📑 Gerar Relatório TXT",
-            relatorio_txt,
-            f"relatorio_custos_{datetime.now().strftime('%Y%m%d_%H%M')}.txt",
-            "text/plain",
-            use_container_width=True
-        )
+        with col1:
+            st.download_button(
+                "📄 Exportar CSV",
+                _to_csv_bytes(df_filtrado),
+                f"custos_artico_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
+                "text/csv",
+                use_container_width=True
+            )
 
-else:
-    # Estado vazio
-    st.markdown("""
+        with col2:
+            # Exportar Excel
+            st.download_button(
+                "📊 Exportar Excel",
+                _to_xlsx_bytes(df_filtrado),
+                f"custos_artico_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True
+            )
+
+        with col3:
+            # Botão de relatório em texto
+            relatorio_txt = gerar_relatorio_simples(df_filtrado)
+            st.download_button(
+                "📑 Gerar Relatório TXT",
+                relatorio_txt,
+                f"relatorio_custos_{datetime.now().strftime('%Y%m%d_%H%M')}.txt",
+                "text/plain",
+                use_container_width=True
+            )
+
+    else:
+        # Estado vazio
+        st.markdown("""
     <div style='text-align: center; padding: 4rem;'>
         <h2>📋 Nenhum registro encontrado</h2>
         <p>Comece adicionando seu primeiro custo usando o formulário na barra lateral.</p>
     </div>
     """, unsafe_allow_html=True)
 
+
+painel(df)
+
 # =============================================
 # RODAPÉ
 # =============================================